@@ -19,14 +19,28 @@ CLAUDE_MODEL = "claude-sonnet-4-20250514"
 CHROMA_PERSIST_DIR = os.path.join(os.path.dirname(__file__), "chroma_db")
 CHROMA_COLLECTION_NAME = "campus_resources"
 
+INDEX_BATCH_SIZE = 128  # Documents per collection.add call during index builds
+
+# --- HNSW index (applied when the collection is first created) ---
+HNSW_SPACE = "cosine"
+HNSW_M = 16  # Graph connectivity per node
+HNSW_CONSTRUCTION_EF = 128  # Candidate list size while building the index
+HNSW_SEARCH_EF = int(os.getenv("HNSW_EF_SEARCH", "100"))  # Higher = better recall, slower queries
+
 # --- Data ---
 CAMPUS_DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "campus_data.json")
+# Prebuilt documents generated by scripts/build_docs.py (used while in sync with campus_data.json)
+CAMPUS_DOCS_PATH = os.path.join(os.path.dirname(__file__), "data", "campus_docs.jsonl")
 
 # --- Retrieval ---
 TOP_K_RESULTS = 5  # Number of documents to retrieve per query
 
+# --- Answer cache ---
+ANSWER_CACHE_SIZE = 512  # Max answers kept for repeated questions (0 disables)
+
 # --- Embedding Model ---
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # sentence-transformers model (local, free)
+EMBEDDING_DEVICE = os.getenv("ICRA_DEVICE", "auto")  # "auto", "cpu", "cuda", or "mps"
 
 # --- Logging ---
 VERBOSE = True  # Show retrieval logs during demo
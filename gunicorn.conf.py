@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for running ICRA with multiple workers.
+
+Run:  gunicorn server:app
+
+preload_app imports server.py once in the master process, which loads the
+sentence-transformer model there. Workers are then forked from the master
+and share the model weights copy-on-write, so the model sits in memory
+once instead of once per worker.
+
+on_starting builds the index before any worker is forked (why: see
+scripts/build_index.py).
+"""
+
+import os
+import subprocess
+import sys
+
+bind = os.getenv("ICRA_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("ICRA_WORKERS", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    # A child process keeps Chroma's SQLite connection out of the master,
+    # so no open handle is inherited by the forked workers.
+    root = os.path.dirname(os.path.abspath(__file__))
+    script = os.path.join(root, "scripts", "build_index.py")
+    subprocess.run([sys.executable, script], check=True)
@@ -4,24 +4,75 @@ Reads campus data from JSON, converts entries into documents,
 and loads them into a ChromaDB collection with sentence-transformer embeddings.
 """
 
-import json
+import functools
+import hashlib
 import logging
+import os
 import chromadb
+import numpy as np
+import orjson  # much faster parsing than json on cold start
 from chromadb.utils import embedding_functions
 
 import config
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever the collection contents change, so caches keyed on it
+# (e.g. rag_pipeline's answer cache) stop serving stale results.
+_collection_version = 0
+
+
+def resolve_device(device: str = config.EMBEDDING_DEVICE) -> str:
+    """
+    Pick the torch device for the embedding model.
+
+    "auto" prefers CUDA when available. Apple MPS is not auto-selected: we
+    mostly embed one short query at a time, where host-to-GPU transfer costs
+    more than the MiniLM forward pass saves. Set ICRA_DEVICE=mps explicitly
+    for large index builds.
+    """
+    if device != "auto":
+        return device
+    import torch  # installed with sentence-transformers
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_function() -> embedding_functions.SentenceTransformerEmbeddingFunction:
+    """Return the shared sentence-transformer embedding function (loaded once)."""
+    device = resolve_device()
+    logger.info(f"Loading embedding model {config.EMBEDDING_MODEL} on {device}")
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=config.EMBEDDING_MODEL,
+        device=device,
+        normalize_embeddings=True,
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def embed_query(query: str) -> tuple[float, ...]:
+    """
+    Embed a single query string.
+    Cached so repeated questions skip the sentence-transformer forward pass.
+    """
+    return tuple(map(float, get_embedding_function()([query])[0]))
+
 
 def load_campus_data(path: str = config.CAMPUS_DATA_PATH) -> list[dict]:
     """Load campus entries from the JSON file."""
-    with open(path, "r") as f:
-        data = json.load(f)
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
     logger.info(f"Loaded {len(data)} entries from {path}")
     return data
 
 
+# Version of the text/metadata produced by entry_to_document and
+# entry_to_metadata. Bump it whenever their output changes, so prebuilt
+# campus_docs.jsonl files from the old format are rejected.
+DOCS_FORMAT_VERSION = 1
+
+
 def entry_to_document(entry: dict) -> str:
     """
     Convert a single campus data entry into a text document for embedding.
@@ -29,28 +80,136 @@ def entry_to_document(entry: dict) -> str:
     the full semantics of the entry.
     """
     # Format hours — they can be a dict with varying keys
+    hours = entry.get("hours")
     hours_lines = []
-    if isinstance(entry.get("hours"), dict):
-        for period, time in entry["hours"].items():
-            label = period.replace("_", " ").title()
-            hours_lines.append(f"  {label}: {time}")
+    if isinstance(hours, dict):
+        hours_lines = [
+            f"  {period.replace('_', ' ').title()}: {time}"
+            for period, time in hours.items()
+        ]
     hours_text = "\n".join(hours_lines) if hours_lines else "  Not specified"
 
     # Format additional info
     additional = "\n".join(
-        f"  - {item}" for item in entry.get("additional_info", [])
+        [f"  - {item}" for item in entry.get("additional_info", [])]
     )
 
-    doc = (
-        f"Name: {entry['name']}\n"
-        f"Type: {entry['type']}\n"
-        f"Location: {entry['location']}\n"
-        f"Hours:\n{hours_text}\n"
-        f"Description: {entry['description']}\n"
-        f"Contact: {entry['contact']}\n"
-        f"Additional Info:\n{additional}"
-    )
-    return doc
+    return "\n".join([
+        f"Name: {entry['name']}",
+        f"Type: {entry['type']}",
+        f"Location: {entry['location']}",
+        f"Hours:\n{hours_text}",
+        f"Description: {entry['description']}",
+        f"Contact: {entry['contact']}",
+        f"Additional Info:\n{additional}",
+    ])
+
+
+def entry_to_metadata(entry: dict) -> dict:
+    """Pick the fields stored as ChromaDB metadata for an entry."""
+    return {
+        "name": entry["name"],
+        "type": entry["type"],
+        "location": entry["location"],
+        "contact": entry["contact"],
+    }
+
+
+def campus_data_digest(data: list[dict]) -> str:
+    """
+    SHA-256 of the parsed campus data, used to detect stale prebuilt docs.
+    Hashing the parsed data (not the file bytes) keeps it stable across
+    line-ending and whitespace changes, e.g. autocrlf checkouts.
+    """
+    canonical = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def prebuilt_documents_header(data: list[dict]) -> dict:
+    """Header line identifying the inputs a prebuilt docs file was built from."""
+    return {
+        "source_sha256": campus_data_digest(data),
+        "format_version": DOCS_FORMAT_VERSION,
+    }
+
+
+def load_prebuilt_documents(
+    data: list[dict],
+    path: str = config.CAMPUS_DOCS_PATH,
+) -> tuple[list[str], list[str], list[dict]] | None:
+    """
+    Load documents precomputed by scripts/build_docs.py from campus `data`.
+
+    The first line of the JSONL file records the campus data digest and
+    DOCS_FORMAT_VERSION it was built with; every following line is one
+    {id, text, metadata} row. Returns (documents, ids, metadatas), or None if
+    the file is missing or its header doesn't match (i.e. it needs rebuilding).
+    """
+    if not os.path.exists(path):
+        return None
+
+    documents = []
+    ids = []
+    metadatas = []
+    with open(path, "rb") as f:
+        header = orjson.loads(f.readline() or b"{}")
+        if header != prebuilt_documents_header(data):
+            logger.warning(
+                f"{path} is out of date with campus data or the document "
+                f"format — ignoring it. Re-run scripts/build_docs.py."
+            )
+            return None
+        for line in f:
+            if not line.strip():
+                continue
+            row = orjson.loads(line)
+            documents.append(row["text"])
+            ids.append(row["id"])
+            metadatas.append(row["metadata"])
+    logger.info(f"Loaded {len(documents)} prebuilt documents from {path}")
+    return documents, ids, metadatas
+
+
+def build_documents() -> tuple[list[str], list[str], list[dict]]:
+    """
+    Return (documents, ids, metadatas) for indexing, preferring the prebuilt
+    JSONL file and falling back to converting campus_data.json entries.
+    """
+    data = load_campus_data()
+
+    # The prebuilt file is only a fast path — never let it break indexing.
+    try:
+        prebuilt = load_prebuilt_documents(data)
+    except Exception as e:
+        logger.warning(f"Could not use prebuilt documents ({e}) — rebuilding.")
+        prebuilt = None
+    if prebuilt is not None:
+        return prebuilt
+
+    documents = []
+    ids = []
+    metadatas = []
+
+    for entry in data:
+        documents.append(entry_to_document(entry))
+        ids.append(entry["id"])
+        metadatas.append(entry_to_metadata(entry))
+    return documents, ids, metadatas
+
+
+def collection_version() -> int:
+    """Return the current knowledge base version (changes on every rebuild)."""
+    return _collection_version
+
+
+def hnsw_metadata() -> dict:
+    """HNSW index settings from config, as ChromaDB collection metadata."""
+    return {
+        "hnsw:space": config.HNSW_SPACE,
+        "hnsw:M": config.HNSW_M,
+        "hnsw:construction_ef": config.HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": config.HNSW_SEARCH_EF,
+    }
 
 
 def get_or_create_collection(
@@ -62,10 +221,9 @@ def get_or_create_collection(
     Args:
         reset: If True, delete existing collection and rebuild from scratch.
     """
+    global _collection_version
     # Use sentence-transformers for local, free embeddings
-    ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=config.EMBEDDING_MODEL
-    )
+    ef = get_embedding_function()
 
     client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIR)
 
@@ -76,36 +234,55 @@ def get_or_create_collection(
         except Exception:
             pass  # Collection didn't exist — that's fine
 
-    # get_or_create is idempotent: returns existing if already populated
-    collection = client.get_or_create_collection(
-        name=config.CHROMA_COLLECTION_NAME,
-        embedding_function=ef,
-    )
+    # Open an existing collection as-is. Its HNSW settings were fixed when it
+    # was created; passing new metadata to get_or_create_collection would only
+    # relabel it (chromadb 0.5 rewrites the metadata, not the index) and costs
+    # a sysdb write on every start. Use reset=True to rebuild with new values.
+    hnsw = hnsw_metadata()
+    try:
+        collection = client.get_collection(
+            name=config.CHROMA_COLLECTION_NAME,
+            embedding_function=ef,
+        )
+    except Exception:
+        collection = None  # Doesn't exist yet — created below
+
+    if collection is None:
+        collection = client.create_collection(
+            name=config.CHROMA_COLLECTION_NAME,
+            embedding_function=ef,
+            metadata=hnsw,
+        )
+    else:
+        existing = collection.metadata or {}
+        stale = {
+            key: existing.get(key)
+            for key, value in hnsw.items()
+            if existing.get(key) != value
+        }
+        if stale:
+            logger.warning(
+                f"Existing collection was built with different HNSW settings "
+                f"{stale} (configured: {hnsw}). They stay in effect until the "
+                f"collection is rebuilt with get_or_create_collection(reset=True) "
+                f"or {config.CHROMA_PERSIST_DIR} is deleted."
+            )
 
     # Only populate if the collection is empty
     if collection.count() == 0:
         logger.info("Collection is empty — loading campus data...")
-        data = load_campus_data()
-        documents = []
-        ids = []
-        metadatas = []
-
-        for entry in data:
-            doc_text = entry_to_document(entry)
-            documents.append(doc_text)
-            ids.append(entry["id"])
-            metadatas.append({
-                "name": entry["name"],
-                "type": entry["type"],
-                "location": entry["location"],
-                "contact": entry["contact"],
-            })
-
-        collection.add(
-            documents=documents,
-            ids=ids,
-            metadatas=metadatas,
-        )
+        documents, ids, metadatas = build_documents()
+
+        # Insert in fixed-size batches so large datasets don't turn into
+        # one huge write (or many tiny ones) against Chroma's SQLite store.
+        batch = config.INDEX_BATCH_SIZE
+        for start in range(0, len(documents), batch):
+            collection.add(
+                documents=documents[start:start + batch],
+                ids=ids[start:start + batch],
+                metadatas=metadatas[start:start + batch],
+            )
+        _collection_version += 1
         logger.info(f"Added {len(documents)} documents to ChromaDB.")
     else:
         logger.info(
@@ -123,10 +300,21 @@ def query_knowledge_base(
     """
     Query the ChromaDB collection and return the top-k results.
 
-    Returns a dict with keys: documents, metadatas, distances, ids
+    Chroma's nested per-query lists and per-result metadata dicts are
+    flattened into parallel arrays (one entry per result), so callers walk
+    them in a single pass and distances can be used in vectorized math.
+
+    Returns a dict with keys: docs, names, types, distances, ids
     """
     results = collection.query(
-        query_texts=[query],
+        query_embeddings=[list(embed_query(query))],
         n_results=top_k,
     )
-    return results
+    metadatas = results["metadatas"][0]  # ChromaDB returns nested lists
+    return {
+        "docs": np.array(results["documents"][0], dtype=object),
+        "names": np.array([m["name"] for m in metadatas], dtype=object),
+        "types": np.array([m["type"] for m in metadatas], dtype=object),
+        "distances": np.asarray(results["distances"][0], dtype=np.float32),
+        "ids": np.array(results["ids"][0], dtype=object),
+    }
@@ -9,9 +9,11 @@ Run:  python main.py
 import logging
 import sys
 
+import numpy as np
+
 import config
 from knowledge_base import get_or_create_collection
-from rag_pipeline import generate_answer
+from rag_pipeline import generate_answer_stream
 
 # ── ANSI color helpers ──────────────────────────────────────────────────────
 
@@ -58,27 +60,42 @@ Type 'quit' or 'exit' to leave.{RESET}
 """
 
 
-def print_retrieved_docs(result):
+_DOC_LINE = (
+    f"  {YELLOW}[{{i}}]{RESET} {BOLD}{{name}}{RESET} "
+    f"{DIM}({{type}}) — relevance ≈ {{score:.0f}}%{RESET}"
+).format
+
+
+def relevance_scores(distances, space: str) -> np.ndarray:
+    """
+    Convert distances to a rough relevance % (cosine similarity, clipped at 0).
+
+    Embeddings are normalized, so squared l2 distance is 2 - 2cos, while
+    cosine (and ip) distance is 1 - cos.
+    """
+    distances = np.asarray(distances)
+    similarity = 1 - distances / 2 if space == "l2" else 1 - distances
+    return np.clip(similarity, 0, None) * 100
+
+
+def print_retrieved_docs(result, space: str):
     """Print the retrieved documents section for demo visibility."""
     print(f"\n{color('── Retrieved Documents ──', YELLOW)}")
-    for i, (doc_meta, dist) in enumerate(
-        zip(result.sources, result.distances), 1
-    ):
-        score_pct = max(0, (1 - dist / 2)) * 100  # rough relevance %
-        print(
-            f"  {color(f'[{i}]', YELLOW)} "
-            f"{color(doc_meta['name'], BOLD)} "
-            f"{DIM}({doc_meta['type']}) — "
-            f"relevance ≈ {score_pct:.0f}%{RESET}"
-        )
+    scores = relevance_scores(result.distances, space)
+    print("\n".join(
+        _DOC_LINE(i=i, name=doc_meta["name"], type=doc_meta["type"], score=score)
+        for i, (doc_meta, score) in enumerate(zip(result.sources, scores), 1)
+    ))
     print()
 
 
-def print_answer(result):
-    """Print the generated answer."""
+def print_answer(result, tokens):
+    """Print the generated answer as it streams in."""
     print(color("── Answer ──", GREEN))
-    print(f"{GREEN}{result.answer}{RESET}")
-    print()
+    print(GREEN, end="")
+    for text in tokens:
+        print(text, end="", flush=True)
+    print(f"{RESET}\n")
 
     # Sources footer
     if result.sources:
@@ -110,6 +127,7 @@ def main():
         print(color(f"Failed to initialize knowledge base: {e}", RED))
         sys.exit(1)
     print(f"{DIM}Ready! {collection.count()} documents indexed.{RESET}\n")
+    space = (collection.metadata or {}).get("hnsw:space", "l2")  # Chroma's default
 
     # ── Interactive loop ──
     while True:
@@ -125,12 +143,12 @@ def main():
             print(f"{DIM}Goodbye!{RESET}")
             break
 
-        # Run the RAG pipeline
-        result = generate_answer(question, collection)
+        # Run the RAG pipeline (retrieval now, generation streams below)
+        result, tokens = generate_answer_stream(question, collection)
 
         # Display results
-        print_retrieved_docs(result)
-        print_answer(result)
+        print_retrieved_docs(result, space)
+        print_answer(result, tokens)
 
 
 if __name__ == "__main__":
@@ -8,17 +8,35 @@ Handles the full Retrieve → Augment → Generate flow:
   5. Returns the answer along with source information
 """
 
+import asyncio
 import logging
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator
 from dataclasses import dataclass, field
 
 import anthropic
 import chromadb
 
 import config
-from knowledge_base import query_knowledge_base
+from knowledge_base import collection_version, query_knowledge_base
 
 logger = logging.getLogger(__name__)
 
+# Build the clients once at import so their HTTP connection pools are reused
+# across requests instead of paying a fresh TCP + TLS handshake per question.
+_client = (
+    anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+    if config.ANTHROPIC_API_KEY
+    else None
+)
+_async_client = (
+    anthropic.AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
+    if config.ANTHROPIC_API_KEY
+    else None
+)
+
 
 @dataclass
 class RAGResult:
@@ -43,22 +61,214 @@ and suggest where the user might find help.
 - If hours or contact info are in the context, include them in your answer.
 """
 
+# The system prompt is the only part of the request that never changes, so
+# it carries the cache breakpoint. Note that Anthropic only caches prefixes of
+# at least 1024 tokens on Sonnet models; the prompt above is ~130 tokens, so
+# today this creates no cache entry (the usage log shows read=0, created=0).
+# It starts paying off only if the system prompt grows past that minimum.
+SYSTEM_BLOCKS = [
+    {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    },
+]
+
+
+_SOURCE_BLOCK = "--- Source {i} (similarity distance: {dist:.4f}) ---\n{doc}\n".format
+
 
 def build_context_block(results: dict) -> str:
     """
     Format retrieved documents into a context block for the prompt.
     """
-    docs = results["documents"][0]  # ChromaDB returns nested lists
-    metadatas = results["metadatas"][0]
-    distances = results["distances"][0]
+    return "\n".join(
+        _SOURCE_BLOCK(i=i, dist=dist, doc=doc)
+        for i, (doc, dist) in enumerate(
+            zip(results["docs"], results["distances"]), 1
+        )
+    )
+
+
+NO_RESULTS_ANSWER = (
+    "I couldn't find any relevant information in the campus "
+    "knowledge base. Please try rephrasing your question or "
+    "contact Student Services for help."
+)
+
+NON_QUESTION_ANSWER = (
+    "Please ask a specific question about campus resources."
+)
+
+MISSING_KEY_ANSWER = (
+    "ERROR: ANTHROPIC_API_KEY is not set. "
+    "Please add it to your .env file.\n"
+    "See .env.example for the expected format."
+)
+
+
+def is_non_question(question: str) -> bool:
+    """
+    True for input too short or content-free to be worth retrieving for,
+    e.g. "", "hi", "." or emoji-only text.
+
+    The length rule only applies to ASCII input: in scripts that don't
+    separate words with spaces, two characters can be a real question
+    (e.g. "食堂", "cafeteria").
+    """
+    q = question.strip()
+    if re.fullmatch(r"[\W_]*", q):
+        return True
+    return q.isascii() and len(q) < 3
+
+
+def build_user_message(question: str, results: dict) -> str:
+    """
+    Log the retrieved documents and build the user prompt around them.
+    """
+    # Log retrieval details
+    for i, (name, type_, dist) in enumerate(
+        zip(results["names"], results["types"], results["distances"]), 1
+    ):
+        logger.info(f"  [{i}] {name} (type={type_}, distance={dist:.4f})")
+
+    context_block = build_context_block(results)
 
-    blocks = []
-    for i, (doc, meta, dist) in enumerate(zip(docs, metadatas, distances), 1):
-        blocks.append(
-            f"--- Source {i} (similarity distance: {dist:.4f}) ---\n"
-            f"{doc}\n"
+    return (
+        f"Context documents:\n\n{context_block}\n\n"
+        f"Student question: {question}\n\n"
+        f"Provide a helpful answer based on the context above."
+    )
+
+
+def build_sources(results: dict) -> list[dict]:
+    """
+    Extract the id / name / type of each retrieved document.
+    """
+    return [
+        {"id": id_, "name": name, "type": type_}
+        for id_, name, type_ in zip(
+            results["ids"], results["names"], results["types"]
         )
-    return "\n".join(blocks)
+    ]
+
+
+def api_error_message(error: anthropic.APIError) -> str:
+    """
+    Turn an Anthropic API exception into a user-facing error answer.
+    """
+    if isinstance(error, anthropic.AuthenticationError):
+        return "ERROR: Invalid Anthropic API key. Please check your .env file."
+    if isinstance(error, anthropic.RateLimitError):
+        return "ERROR: Rate limit exceeded. Please wait a moment and try again."
+    return f"ERROR: Anthropic API error — {error}"
+
+
+# Answers for repeated questions, most recently used last. Keys include the
+# knowledge base version, so a rebuilt collection never serves old answers.
+# The lock is needed because the async pipeline prepares requests in worker
+# threads while the event loop thread stores finished answers.
+_answer_cache: OrderedDict[tuple, RAGResult] = OrderedDict()
+_answer_cache_lock = threading.Lock()
+
+
+def _cache_key(question: str, top_k: int) -> tuple:
+    return (collection_version(), top_k, " ".join(question.lower().split()))
+
+
+def _cache_get(key: tuple) -> RAGResult | None:
+    with _answer_cache_lock:
+        result = _answer_cache.get(key)
+        if result is not None:
+            _answer_cache.move_to_end(key)
+    if result is not None:
+        logger.info("Answer cache hit — skipping retrieval and generation.")
+    return result
+
+
+def _cache_put(key: tuple, result: RAGResult) -> None:
+    if config.ANSWER_CACHE_SIZE <= 0:
+        return
+    with _answer_cache_lock:
+        _answer_cache[key] = result
+        _answer_cache.move_to_end(key)
+        while len(_answer_cache) > config.ANSWER_CACHE_SIZE:
+            _answer_cache.popitem(last=False)
+
+
+def _message_params(user_message: str) -> dict:
+    """Keyword arguments shared by every Claude messages call."""
+    return {
+        "model": config.CLAUDE_MODEL,
+        "max_tokens": 1024,
+        "system": SYSTEM_BLOCKS,
+        "messages": [
+            {"role": "user", "content": user_message},
+        ],
+    }
+
+
+def _log_cache_usage(response) -> None:
+    logger.info(
+        f"Prompt cache: read={response.usage.cache_read_input_tokens or 0}, "
+        f"created={response.usage.cache_creation_input_tokens or 0} tokens"
+    )
+
+
+def _prepare(
+    question: str,
+    collection: chromadb.Collection,
+    top_k: int,
+) -> RAGResult | tuple[RAGResult, tuple, str]:
+    """
+    Run every step that comes before the Claude call: the non-question
+    check, the answer cache, retrieval and prompt building.
+
+    Returns a finished RAGResult when no Claude call is needed. Otherwise it
+    returns (result, cache_key, user_message): result has sources filled in
+    and an empty answer for the caller to set.
+    """
+    if is_non_question(question):
+        return RAGResult(answer=NON_QUESTION_ANSWER)
+
+    key = _cache_key(question, top_k)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    # ---- Step 1: Retrieve ----
+    logger.info(f"Retrieving top-{top_k} documents for: '{question}'")
+    results = query_knowledge_base(collection, question, top_k=top_k)
+
+    docs = results["docs"].tolist()
+    distances = results["distances"].tolist()
+
+    if not docs:
+        result = RAGResult(answer=NO_RESULTS_ANSWER)
+        _cache_put(key, result)
+        return result
+
+    # ---- Step 2: Augment — build the prompt ----
+    user_message = build_user_message(question, results)
+
+    if not config.ANTHROPIC_API_KEY:
+        return RAGResult(
+            answer=MISSING_KEY_ANSWER,
+            retrieved_docs=docs,
+            distances=distances,
+        )
+
+    result = RAGResult(
+        answer="",
+        sources=build_sources(results),
+        retrieved_docs=docs,
+        distances=distances,
+    )
+    return result, key, user_message
+
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
 
 
 def generate_answer(
@@ -77,86 +287,126 @@ def generate_answer(
     Returns:
         RAGResult with the generated answer and source metadata.
     """
-    # ---- Step 1: Retrieve ----
-    logger.info(f"Retrieving top-{top_k} documents for: '{question}'")
-    results = query_knowledge_base(collection, question, top_k=top_k)
+    prepared = _prepare(question, collection, top_k)
+    if isinstance(prepared, RAGResult):
+        return prepared
+    result, key, user_message = prepared
 
-    docs = results["documents"][0]
-    metadatas = results["metadatas"][0]
-    distances = results["distances"][0]
-    ids = results["ids"][0]
-
-    if not docs:
-        return RAGResult(
-            answer="I couldn't find any relevant information in the campus "
-                   "knowledge base. Please try rephrasing your question or "
-                   "contact Student Services for help.",
-            sources=[],
-            retrieved_docs=[],
-            distances=[],
-        )
+    # ---- Step 3: Generate ----
+    logger.info("Sending prompt to Claude...")
+    try:
+        response = _client.messages.create(**_message_params(user_message))
+        result.answer = response.content[0].text
+        _log_cache_usage(response)
+    except anthropic.APIError as e:
+        result.answer = api_error_message(e)
+    else:
+        _cache_put(key, result)
+    return result
 
-    # Log retrieval details
-    for i, (meta, dist) in enumerate(zip(metadatas, distances), 1):
-        logger.info(
-            f"  [{i}] {meta['name']} (type={meta['type']}, "
-            f"distance={dist:.4f})"
-        )
 
-    # ---- Step 2: Augment — build the prompt ----
-    context_block = build_context_block(results)
+async def generate_answer_async(
+    question: str,
+    collection: chromadb.Collection,
+    top_k: int = config.TOP_K_RESULTS,
+) -> RAGResult:
+    """
+    Async variant of generate_answer for the FastAPI server.
 
-    user_message = (
-        f"Context documents:\n\n{context_block}\n\n"
-        f"Student question: {question}\n\n"
-        f"Provide a helpful answer based on the context above."
-    )
+    Retrieval (a blocking ChromaDB query plus embedding) runs in a worker
+    thread and generation uses AsyncAnthropic, so the event loop stays free
+    to serve other requests while this one waits on Claude.
+    """
+    prepared = await asyncio.to_thread(_prepare, question, collection, top_k)
+    if isinstance(prepared, RAGResult):
+        return prepared
+    result, key, user_message = prepared
 
     # ---- Step 3: Generate ----
     logger.info("Sending prompt to Claude...")
-
-    if not config.ANTHROPIC_API_KEY:
-        return RAGResult(
-            answer="ERROR: ANTHROPIC_API_KEY is not set. "
-                   "Please add it to your .env file.\n"
-                   "See .env.example for the expected format.",
-            sources=[],
-            retrieved_docs=docs,
-            distances=distances,
-        )
-
-    client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
-
     try:
-        response = client.messages.create(
-            model=config.CLAUDE_MODEL,
-            max_tokens=1024,
-            system=SYSTEM_PROMPT,
-            messages=[
-                {"role": "user", "content": user_message},
-            ],
-        )
-        answer_text = response.content[0].text
-    except anthropic.AuthenticationError:
-        answer_text = (
-            "ERROR: Invalid Anthropic API key. Please check your .env file."
-        )
-    except anthropic.RateLimitError:
-        answer_text = (
-            "ERROR: Rate limit exceeded. Please wait a moment and try again."
+        response = await _async_client.messages.create(
+            **_message_params(user_message)
         )
+        result.answer = response.content[0].text
+        _log_cache_usage(response)
     except anthropic.APIError as e:
-        answer_text = f"ERROR: Anthropic API error — {e}"
+        result.answer = api_error_message(e)
+    else:
+        _cache_put(key, result)
+    return result
 
-    # ---- Build result ----
-    sources = [
-        {"id": ids[i], "name": metadatas[i]["name"], "type": metadatas[i]["type"]}
-        for i in range(len(ids))
-    ]
 
-    return RAGResult(
-        answer=answer_text,
-        sources=sources,
-        retrieved_docs=docs,
-        distances=distances,
-    )
+def generate_answer_stream(
+    question: str,
+    collection: chromadb.Collection,
+    top_k: int = config.TOP_K_RESULTS,
+) -> tuple[RAGResult, Iterator[str]]:
+    """
+    Streaming variant of generate_answer, used by the terminal demo.
+
+    Retrieval runs immediately; generation is deferred to the returned
+    iterator, which yields answer text as Claude produces it. The RAGResult
+    has its sources filled in up front, and its answer is set once the
+    iterator is exhausted.
+    """
+    prepared = _prepare(question, collection, top_k)
+    if isinstance(prepared, RAGResult):
+        return prepared, iter([prepared.answer])
+    result, key, user_message = prepared
+
+    # ---- Step 3: Generate (lazily, as the caller iterates) ----
+    def tokens() -> Iterator[str]:
+        logger.info("Streaming prompt to Claude...")
+        chunks = []
+        try:
+            with _client.messages.stream(**_message_params(user_message)) as stream:
+                for text in stream.text_stream:
+                    chunks.append(text)
+                    yield text
+                _log_cache_usage(stream.get_final_message())
+            result.answer = "".join(chunks)
+            _cache_put(key, result)
+        except anthropic.APIError as e:
+            chunks.append(api_error_message(e))
+            yield chunks[-1]
+        finally:
+            result.answer = "".join(chunks)
+
+    return result, tokens()
+
+
+async def generate_answer_stream_async(
+    question: str,
+    collection: chromadb.Collection,
+    top_k: int = config.TOP_K_RESULTS,
+) -> tuple[RAGResult, AsyncIterator[str]]:
+    """
+    Async variant of generate_answer_stream for the FastAPI server.
+    """
+    prepared = await asyncio.to_thread(_prepare, question, collection, top_k)
+    if isinstance(prepared, RAGResult):
+        return prepared, _single_chunk(prepared.answer)
+    result, key, user_message = prepared
+
+    # ---- Step 3: Generate (lazily, as the caller iterates) ----
+    async def tokens() -> AsyncIterator[str]:
+        logger.info("Streaming prompt to Claude...")
+        chunks = []
+        try:
+            async with _async_client.messages.stream(
+                **_message_params(user_message)
+            ) as stream:
+                async for text in stream.text_stream:
+                    chunks.append(text)
+                    yield text
+                _log_cache_usage(await stream.get_final_message())
+            result.answer = "".join(chunks)
+            _cache_put(key, result)
+        except anthropic.APIError as e:
+            chunks.append(api_error_message(e))
+            yield chunks[-1]
+        finally:
+            result.answer = "".join(chunks)
+
+    return result, tokens()
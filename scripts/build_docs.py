@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Precompute knowledge base documents for ICRA.
+
+Converts every entry in data/campus_data.json to its document text once and
+writes data/campus_docs.jsonl: a header line with the campus data digest and
+DOCS_FORMAT_VERSION, then one {id, text, metadata} row per entry. The
+knowledge base loads this file directly while the header still matches, so
+index builds skip the per-entry formatting.
+
+Run:  python scripts/build_docs.py   (re-run after editing campus_data.json
+                                      or bumping DOCS_FORMAT_VERSION)
+"""
+
+import os
+import sys
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from knowledge_base import (  # noqa: E402
+    entry_to_document,
+    entry_to_metadata,
+    load_campus_data,
+    prebuilt_documents_header,
+)
+
+
+def main():
+    data = load_campus_data()
+    with open(config.CAMPUS_DOCS_PATH, "wb") as f:
+        f.write(orjson.dumps(prebuilt_documents_header(data)) + b"\n")
+        for entry in data:
+            row = {
+                "id": entry["id"],
+                "text": entry_to_document(entry),
+                "metadata": entry_to_metadata(entry),
+            }
+            f.write(orjson.dumps(row) + b"\n")
+    print(f"Wrote {len(data)} documents to {config.CAMPUS_DOCS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Build the ICRA ChromaDB index if it does not exist yet.
+
+Servers with several worker processes must run this before the workers
+start: each worker opens the same chroma_db/ directory, and Chroma's
+persistent client is not safe for several processes populating it at once.
+gunicorn.conf.py runs it automatically.
+
+Run:  python scripts/build_index.py [--reset]
+"""
+
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base import get_or_create_collection  # noqa: E402
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    collection = get_or_create_collection(reset="--reset" in sys.argv[1:])
+    print(f"Index ready — {collection.count()} documents.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,53 @@
 """
 ICRA — FastAPI server.
-Exposes the RAG pipeline as a simple POST /ask endpoint.
+Exposes the RAG pipeline as a simple POST /ask endpoint, plus
+POST /ask/stream which streams the answer as server-sent events.
 
 Run:  uvicorn server:app --reload
+      gunicorn server:app            (multiple workers, see gunicorn.conf.py)
 """
 
+import json
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 
 import config
-from knowledge_base import get_or_create_collection
-from rag_pipeline import generate_answer
+from knowledge_base import (
+    get_embedding_function,
+    get_or_create_collection,
+    resolve_device,
+)
+from rag_pipeline import (
+    NON_QUESTION_ANSWER,
+    generate_answer_async,
+    generate_answer_stream_async,
+    is_non_question,
+)
 
 logger = logging.getLogger(__name__)
 
+# ── Embedding model: load at import so preloaded workers share it ───────────
+
+# Under `gunicorn --preload` this runs once in the master process, and the
+# forked workers share the weights copy-on-write instead of each loading
+# their own copy. CUDA state does not survive fork, so GPU models are still
+# loaded per worker (lazily, on first use). The NVML-based check makes
+# resolve_device() probe for CUDA without initializing it in the master,
+# which would leave the forked workers unable to use CUDA.
+os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+if resolve_device() == "cpu":
+    get_embedding_function()
+
 # ── Lifespan: load ChromaDB once at startup ─────────────────────────────────
 
+# With several workers, build the index first — see scripts/build_index.py.
+
 collection = None
 
 
@@ -115,18 +142,48 @@ async def index():
     btn.disabled = true;
     result.innerHTML = '<p style="color:#888">Thinking...</p>';
     try {
-      const res = await fetch('/ask', {
+      const res = await fetch('/ask/stream', {
         method: 'POST',
         headers: {'Content-Type': 'application/json'},
         body: JSON.stringify({question: q}),
       });
-      const data = await res.json();
-      let html = '<div class="answer">' + escapeHtml(data.answer) + '</div>';
-      if (data.sources && data.sources.length) {
-        const names = data.sources.map(s => s.name).join(', ');
-        html += '<div class="sources">Sources: ' + escapeHtml(names) + '</div>';
+      if (!res.ok) {
+        throw new Error('server returned ' + res.status + ' ' + res.statusText);
+      }
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let answer = null;
+      let buffer = '';
+      while (true) {
+        const {done, value} = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, {stream: true});
+        const events = buffer.split('\\n\\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = parseEvent(raw);
+          if (event.type === 'sources') {
+            if (event.data.length) {
+              const names = event.data.map(s => s.name).join(', ');
+              const div = document.createElement('div');
+              div.className = 'sources';
+              div.textContent = 'Sources: ' + names;
+              result.appendChild(div);
+            }
+          } else if (event.type === 'token') {
+            if (!answer) {
+              result.innerHTML = '<div class="answer"></div>';
+              answer = result.querySelector('.answer');
+            }
+            answer.textContent += event.data.text;
+          } else if (event.type === 'error') {
+            throw new Error(event.data.message);
+          }
+        }
+      }
+      if (!answer) {
+        throw new Error('the server ended the response without an answer');
       }
-      result.innerHTML = html;
     } catch (err) {
       result.innerHTML = '<p style="color:red">Error: ' + escapeHtml(err.message) + '</p>';
     } finally {
@@ -134,6 +191,16 @@ async def index():
     }
   });
 
+  function parseEvent(raw) {
+    let type = 'message';
+    let data = '';
+    for (const line of raw.split('\\n')) {
+      if (line.startsWith('event: ')) type = line.slice(7);
+      else if (line.startsWith('data: ')) data += line.slice(6);
+    }
+    return {type, data: JSON.parse(data || 'null')};
+  }
+
   function escapeHtml(text) {
     const d = document.createElement('div');
     d.textContent = text;
@@ -146,8 +213,34 @@ async def index():
 
 @app.post("/ask", response_model=AskResponse)
 async def ask(req: AskRequest):
-    result = generate_answer(req.question, collection)
+    if is_non_question(req.question):
+        return AskResponse(answer=NON_QUESTION_ANSWER, sources=[])
+    result = await generate_answer_async(req.question, collection)
     return AskResponse(
         answer=result.answer,
         sources=[Source(**s) for s in result.sources],
     )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    result, tokens = await generate_answer_stream_async(req.question, collection)
+
+    async def events():
+        try:
+            async for text in tokens:
+                yield _sse("token", {"text": text})
+        except Exception:
+            # Headers are already sent, so report the failure in-stream.
+            logger.exception("Streaming answer failed")
+            yield _sse("error", {
+                "message": "Something went wrong while generating the answer.",
+            })
+            return
+        yield _sse("sources", result.sources)
+
+    return StreamingResponse(events(), media_type="text/event-stream")